@@ -1,120 +1,444 @@
 import tkinter as tk
-from tkinter import ttk, messagebox, simpledialog, filedialog
+from tkinter import ttk, messagebox
 import sqlite3
-import hashlib
+from hashlib import sha256 as _sha256
+import hmac
 import random
 import string
 import datetime
+import time
 import csv
+import io
+import itertools
 import os
-
-# Optional reportlab import
+import queue
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+# Optional reportlab import, deferred until the first PDF is needed since it
+# is slow to import; holds (letter, canvas module), or False if not installed
+_reportlab = None
+
+def load_reportlab():
+    global _reportlab
+    if _reportlab is None:
+        try:
+            from reportlab.lib.pagesizes import letter
+            from reportlab.pdfgen import canvas as pdfcanvas
+            _reportlab = (letter, pdfcanvas)
+        except Exception:
+            _reportlab = False
+    return _reportlab
+
+# Optional argon2 import (argon2-cffi); falls back to SHA-256 PIN hashes
 try:
-    from reportlab.lib.pagesizes import letter
-    from reportlab.pdfgen import canvas as pdfcanvas
-    REPORTLAB_AVAILABLE = True
+    from argon2 import PasswordHasher
+    from argon2.exceptions import VerifyMismatchError, InvalidHashError
+    ARGON2_AVAILABLE = True
 except Exception:
-    REPORTLAB_AVAILABLE = False
+    ARGON2_AVAILABLE = False
 
 DB_FILE = "banking.db"
+AUTH_CACHE_TTL = 30  # seconds a successful PIN check is remembered
+AUTH_CACHE_SIZE = 256
+ACCOUNT_NO_TRIES = 3
+CSV_WRITE_BUFFER = 1 << 20  # bytes
+HISTORY_CHUNK = 50  # history rows inserted per Tk idle slice
+POLL_MS = 16  # how often the GUI checks for finished DB jobs
+COALESCE_WINDOW = 0.05  # seconds the DB worker waits to batch deposits/withdraws
+LOGIN_BURST = 5  # login attempts allowed back to back
+LOGIN_REFILL = 6.0  # seconds to earn back one login attempt
+SESSION_TTL = 300  # seconds a login token stays valid
+
+def to_cents(amount):
+    # Money is stored as INTEGER cents; convert amounts at the API boundary
+    return int(round(float(amount) * 100))
+
+def fmt_money(cents):
+    return f"{cents/100:.2f}"
 
 # ------------------------- Database helpers -------------------------
 class DB:
+    # Hot statements, kept as constants so every call hits the same entry
+    # in the connection's prepared-statement cache.
+    _SQL_GET_ACCOUNT = 'SELECT * FROM accounts WHERE account_no=?'
+    _SQL_BALANCE_UPDATE = 'UPDATE accounts SET balance = balance + ? WHERE account_no=?'
+    _SQL_TRANSFER_UPDATE = ('UPDATE accounts SET balance = balance + CASE account_no WHEN ? THEN -? ELSE ? END '
+                            'WHERE account_no IN (?,?)')
+    _SQL_TX_INSERT = 'INSERT INTO transactions(account_no,type,amount,counterparty,timestamp,note) VALUES (?,?,?,?,?,?)'
+    _SQL_GET_TRANSACTIONS = ('SELECT id,type,amount,counterparty,timestamp,note FROM transactions '
+                             'WHERE account_no=? ORDER BY timestamp DESC LIMIT ?')
+    _SQL_GET_TRANSACTION = 'SELECT * FROM transactions WHERE id=?'
+
+    _STOP = object()  # queued by close() to end the worker loop
+
     def __init__(self, path=DB_FILE):
-        self.conn = sqlite3.connect(path, detect_types=sqlite3.PARSE_DECLTYPES|sqlite3.PARSE_COLNAMES)
-        self.conn.row_factory = sqlite3.Row
+        self.path = path
+        # WAL mode keeps <path>-wal and <path>-shm files next to the database
+        # while a connection is open; remove them together with the db file.
+        # The connection is shared with the worker thread started below.
+        self.conn = sqlite3.connect(path, detect_types=sqlite3.PARSE_DECLTYPES|sqlite3.PARSE_COLNAMES,
+                                    cached_statements=256, check_same_thread=False)
+        # Plain tuple rows by default; _row_cur is for lookups that need names
+        self._cur = self.conn.cursor()
+        self._row_cur = self.conn.cursor()
+        self._row_cur.row_factory = sqlite3.Row
+        self._configure()
+        self._ph = PasswordHasher(time_cost=3, memory_cost=4096, parallelism=os.cpu_count() or 1) if ARGON2_AVAILABLE else None
+        self._secret = os.urandom(32)
+        self._auth_cache = OrderedDict()
+        self.version = 0  # bumped on every committed write
+        self._acc_cache = None  # account_no -> (account_no, name, balance, created_at)
+        self._acc_cache_version = None
         self._ensure_tables()
+        self._jobs = queue.Queue()
+        self._closed = False
+        self._worker = threading.Thread(target=self._db_worker, daemon=True)
+        self._worker.start()
+
+    def close(self):
+        """Run any queued work, stop the worker thread and close the connection."""
+        if self._closed:
+            return
+        self._closed = True
+        self._jobs.put(self._STOP)
+        self._worker.join()
+        self.conn.close()
+
+    def submit(self, fn, *args, **kwargs):
+        """Queue ``fn(*args, **kwargs)`` for the DB worker thread and return a Future.
+
+        Once the worker is in use, all access to the connection should go through
+        here (or ``call``) so that statements never run on two threads at once.
+        """
+        if self._closed:
+            raise RuntimeError('database is closed')
+        fut = Future()
+        self._jobs.put((fut, fn, args, kwargs, None))
+        return fut
+
+    def submit_posting(self, kind, account_no, amount, note=None):
+        """Queue a ``'deposit'`` or ``'withdraw'`` and return a Future.
+
+        Unlike ``submit``, the worker may commit it together with other postings
+        queued within COALESCE_WINDOW.
+        """
+        if self._closed:
+            raise RuntimeError('database is closed')
+        if kind not in ('deposit', 'withdraw'):
+            raise ValueError(f'Unknown posting kind: {kind}')
+        fut = Future()
+        self._jobs.put((fut, None, (), {}, (kind, account_no, amount, note)))
+        return fut
+
+    def call(self, fn, *args, **kwargs):
+        # Blocking variant of submit, for quick indexed reads
+        return self.submit(fn, *args, **kwargs).result()
+
+    def _db_worker(self):
+        pending = None
+        while True:
+            job = pending or self._jobs.get()
+            pending = None
+            if job is self._STOP:
+                return
+            if job[4] is None:
+                self._run_job(job)
+                continue
+            # Collect further postings arriving within the window and commit
+            # them together. Any other job ends the batch so that jobs still
+            # run in submission order.
+            batch = [job]
+            deadline = time.monotonic() + COALESCE_WINDOW
+            while True:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    nxt = self._jobs.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if nxt is self._STOP or nxt[4] is None:
+                    pending = nxt
+                    break
+                batch.append(nxt)
+            self._apply_postings([j for j in batch if j[0].set_running_or_notify_cancel()])
+
+    def _run_job(self, job):
+        fut, fn, args, kwargs, _ = job
+        if not fut.set_running_or_notify_cancel():
+            return
+        try:
+            fut.set_result(fn(*args, **kwargs))
+        except Exception as e:
+            fut.set_exception(e)
+
+    def _apply_postings(self, jobs):
+        """Apply queued postings with one UPDATE per account and a single commit.
+
+        Each job is validated in order against the running balance and fails on
+        its own; the accepted ones are committed together.
+        """
+        balances = {}
+        rows = []
+        accepted = []
+        for fut, _, _, _, posting in jobs:
+            try:
+                rows.append(self._stage_posting(*posting, balances))
+            except Exception as e:
+                fut.set_exception(e)
+                continue
+            accepted.append(fut)
+        if not accepted:
+            return
+        try:
+            self._write_postings(rows)
+        except Exception as e:
+            for fut in accepted:
+                fut.set_exception(e)
+            return
+        for fut in accepted:
+            fut.set_result(None)
+
+    def _stage_posting(self, kind, account_no, amount, note, balances):
+        """Validate one deposit/withdraw and return its journal row.
+
+        ``balances`` maps account_no to a running balance in cents; it is filled
+        from the database on first use and updated here, so several postings can
+        be checked in order before any of them is written.
+        """
+        amount = to_cents(amount)
+        if amount <= 0:
+            raise ValueError(f'{kind.capitalize()} amount must be positive')
+        if account_no not in balances:
+            acc = self.get_account(account_no)
+            if not acc:
+                raise ValueError('Account not found')
+            balances[account_no] = acc['balance']
+        if kind == 'withdraw' and balances[account_no] < amount:
+            raise ValueError('Insufficient funds')
+        balances[account_no] += amount if kind == 'deposit' else -amount
+        return (account_no, kind, amount, None, datetime.datetime.utcnow(), note)
+
+    def _write_postings(self, rows, cur=None):
+        # One balance UPDATE per account plus the journal rows, in one commit
+        deltas = {}
+        for account_no, kind, amount, *_ in rows:
+            deltas[account_no] = deltas.get(account_no, 0) + (amount if kind == 'deposit' else -amount)
+        with self._write_txn(cur) as cur:
+            cur.executemany(self._SQL_BALANCE_UPDATE, [(d, a) for a, d in deltas.items()])
+            cur.executemany(self._SQL_TX_INSERT, rows)
+        for account_no, delta in deltas.items():
+            self._cache_adjust(account_no, delta)
+
+    def _configure(self):
+        cur = self.conn.cursor()
+        cur.execute('PRAGMA journal_mode=WAL')
+        cur.execute('PRAGMA synchronous=NORMAL')
+        cur.execute('PRAGMA temp_store=MEMORY')
+        cur.execute('PRAGMA mmap_size=268435456')
+        cur.execute('PRAGMA cache_size=-20000')
+        cur.execute('PRAGMA foreign_keys=ON')
+
+    _ACCOUNTS_DDL = '''
+        CREATE TABLE IF NOT EXISTS {name} (
+            account_no TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            pin_hash TEXT NOT NULL,
+            balance INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMP NOT NULL
+        )
+    '''
+    _TRANSACTIONS_DDL = '''
+        CREATE TABLE IF NOT EXISTS {name} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            account_no TEXT NOT NULL,
+            type TEXT NOT NULL,
+            amount INTEGER NOT NULL,
+            counterparty TEXT,
+            timestamp TIMESTAMP NOT NULL,
+            note TEXT,
+            FOREIGN KEY(account_no) REFERENCES accounts(account_no)
+        )
+    '''
 
     def _ensure_tables(self):
         cur = self.conn.cursor()
-        cur.execute('''
-            CREATE TABLE IF NOT EXISTS accounts (
-                account_no TEXT PRIMARY KEY,
-                name TEXT NOT NULL,
-                pin_hash TEXT NOT NULL,
-                balance REAL NOT NULL DEFAULT 0,
-                created_at TIMESTAMP NOT NULL
-            )
-        ''')
-        cur.execute('''
-            CREATE TABLE IF NOT EXISTS transactions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                account_no TEXT NOT NULL,
-                type TEXT NOT NULL,
-                amount REAL NOT NULL,
-                counterparty TEXT,
-                timestamp TIMESTAMP NOT NULL,
-                note TEXT,
-                FOREIGN KEY(account_no) REFERENCES accounts(account_no)
-            )
-        ''')
+        cur.execute(self._ACCOUNTS_DDL.format(name='accounts'))
+        cur.execute(self._TRANSACTIONS_DDL.format(name='transactions'))
+        self.conn.commit()
+        self._migrate_to_cents()
+        cur.execute('CREATE INDEX IF NOT EXISTS ix_tx_acc_ts ON transactions(account_no, timestamp DESC)')
         self.conn.commit()
 
-    def create_account(self, name, pin, initial_deposit=0.0):
-        account_no = self._generate_account_no()
-        pin_hash = self._hash_pin(pin)
-        now = datetime.datetime.utcnow()
+    def _migrate_to_cents(self):
+        # One-shot rebuild of databases created with REAL balance/amount columns
+        cols = {r[1]: r[2] for r in self.conn.execute('PRAGMA table_info(accounts)')}
+        if cols.get('balance', '').upper() != 'REAL':
+            return
         cur = self.conn.cursor()
-        cur.execute('INSERT INTO accounts(account_no,name,pin_hash,balance,created_at) VALUES (?,?,?,?,?)',
-                    (account_no, name, pin_hash, float(initial_deposit), now))
-        if float(initial_deposit) > 0:
-            cur.execute('INSERT INTO transactions(account_no,type,amount,counterparty,timestamp,note) VALUES (?,?,?,?,?,?)',
-                        (account_no, 'deposit', float(initial_deposit), None, now, 'Initial deposit'))
+        cur.execute('PRAGMA foreign_keys=OFF')
+        try:
+            cur.execute('BEGIN')
+            cur.execute(self._ACCOUNTS_DDL.format(name='accounts_new'))
+            cur.execute('INSERT INTO accounts_new SELECT account_no,name,pin_hash,'
+                        'CAST(ROUND(balance*100) AS INTEGER),created_at FROM accounts')
+            cur.execute(self._TRANSACTIONS_DDL.format(name='transactions_new'))
+            cur.execute('INSERT INTO transactions_new SELECT id,account_no,type,'
+                        'CAST(ROUND(amount*100) AS INTEGER),counterparty,timestamp,note FROM transactions')
+            cur.execute('DROP TABLE transactions')
+            cur.execute('DROP TABLE accounts')
+            cur.execute('ALTER TABLE accounts_new RENAME TO accounts')
+            cur.execute('ALTER TABLE transactions_new RENAME TO transactions')
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        finally:
+            cur.execute('PRAGMA foreign_keys=ON')
+
+    @contextmanager
+    def bulk(self):
+        """Run several writes in one transaction.
+
+        Pass the yielded cursor to the write methods (``create_account``,
+        ``deposit``, ``withdraw``, ``transfer``) so they join it instead of
+        committing on their own.
+        """
+        cur = self.conn.cursor()
+        cur.execute('BEGIN')
+        try:
+            yield cur
+        except Exception:
+            self.conn.rollback()
+            raise
+        finally:
+            self._acc_cache = None
         self.conn.commit()
+        self.version += 1
+
+    @contextmanager
+    def _write_txn(self, cur):
+        # Join the bulk() transaction when given its cursor, otherwise run in a
+        # transaction of our own that commits, or rolls back, on exit.
+        if cur is not None:
+            yield cur
+            return
+        if self.conn.in_transaction:
+            raise RuntimeError('pass the bulk() cursor to write inside a bulk() block')
+        with self.conn:
+            yield self._cur
+        self.version += 1
+
+    def create_account(self, name, pin, initial_deposit=0.0, cur=None):
+        initial_deposit = to_cents(initial_deposit)
+        pin_hash = self._hash_pin(pin)
+        now = datetime.datetime.utcnow()
+        with self._write_txn(cur) as cur:
+            # Let the primary key reject a colliding number instead of probing first
+            for attempt in range(ACCOUNT_NO_TRIES):
+                account_no = self._generate_account_no()
+                try:
+                    cur.execute('INSERT INTO accounts(account_no,name,pin_hash,balance,created_at) VALUES (?,?,?,?,?)',
+                                (account_no, name, pin_hash, initial_deposit, now))
+                    break
+                except sqlite3.IntegrityError:
+                    if attempt == ACCOUNT_NO_TRIES - 1:
+                        raise
+            if initial_deposit > 0:
+                cur.execute('INSERT INTO transactions(account_no,type,amount,counterparty,timestamp,note) VALUES (?,?,?,?,?,?)',
+                            (account_no, 'deposit', initial_deposit, None, now, 'Initial deposit'))
+        if self._acc_cache is not None:
+            self._acc_cache[account_no] = (account_no, name, initial_deposit, now)
         return account_no
 
     def delete_account(self, account_no):
-        cur = self.conn.cursor()
-        cur.execute('DELETE FROM transactions WHERE account_no=?', (account_no,))
-        cur.execute('DELETE FROM accounts WHERE account_no=?', (account_no,))
-        self.conn.commit()
+        with self.conn:
+            cur = self.conn.cursor()
+            cur.execute('DELETE FROM transactions WHERE account_no=?', (account_no,))
+            cur.execute('DELETE FROM accounts WHERE account_no=?', (account_no,))
+        self.version += 1
+        if self._acc_cache is not None:
+            self._acc_cache.pop(account_no, None)
+        for key in [k for k in self._auth_cache if k[0] == account_no]:
+            del self._auth_cache[key]
 
     def list_accounts(self, search=None):
-        cur = self.conn.cursor()
+        # Served from an in-memory mirror of the accounts table, rebuilt when it
+        # is cold or another connection has committed since it was loaded.
+        self._cur.execute('PRAGMA data_version')
+        data_version = self._cur.fetchone()[0]
+        if self._acc_cache is None or data_version != self._acc_cache_version:
+            self._cur.execute('SELECT account_no,name,balance,created_at FROM accounts')
+            self._acc_cache = {r[0]: r for r in self._cur}
+            self._acc_cache_version = data_version
+        rows = self._acc_cache.values()
         if search:
-            q = f"%{search}%"
-            cur.execute('SELECT * FROM accounts WHERE account_no LIKE ? OR name LIKE ? ORDER BY created_at DESC', (q,q))
-        else:
-            cur.execute('SELECT * FROM accounts ORDER BY created_at DESC')
-        return cur.fetchall()
+            # Case-insensitive substring match on account number or name
+            s = search.lower()
+            rows = [r for r in rows if s in r[0].lower() or s in r[1].lower()]
+        return sorted(rows, key=lambda r: r[3], reverse=True)
+
+    def _cache_adjust(self, account_no, delta):
+        r = self._acc_cache and self._acc_cache.get(account_no)
+        if r:
+            self._acc_cache[account_no] = (r[0], r[1], r[2] + delta, r[3])
 
     def get_account(self, account_no):
-        cur = self.conn.cursor()
-        cur.execute('SELECT * FROM accounts WHERE account_no=?', (account_no,))
-        return cur.fetchone()
+        self._row_cur.execute(self._SQL_GET_ACCOUNT, (account_no,))
+        return self._row_cur.fetchone()
 
     def authenticate(self, account_no, pin):
+        # Unknown accounts fail before any KDF work; there is deliberately no
+        # dummy hash, so failed lookups cannot be used to burn CPU. Login
+        # attempts are rate limited in the GUI instead.
         acc = self.get_account(account_no)
         if not acc:
             return False
-        return acc['pin_hash'] == self._hash_pin(pin)
+        # Remember recent successes keyed by an HMAC of the PIN so repeated
+        # checks from the same session skip the KDF.
+        key = (account_no, hmac.new(self._secret, self._pin_bytes(pin), _sha256).digest())
+        seen = self._auth_cache.get(key)
+        if seen is not None and time.monotonic() - seen < AUTH_CACHE_TTL:
+            self._auth_cache.move_to_end(key)
+            return True
+        if not self._verify_pin(acc['pin_hash'], pin):
+            return False
+        if self._ph and not acc['pin_hash'].startswith('$argon2'):
+            # Upgrade legacy SHA-256 hashes on first successful login
+            with self.conn:
+                self.conn.execute('UPDATE accounts SET pin_hash=? WHERE account_no=?', (self._hash_pin(pin), account_no))
+        self._auth_cache[key] = time.monotonic()
+        self._auth_cache.move_to_end(key)
+        while len(self._auth_cache) > AUTH_CACHE_SIZE:
+            self._auth_cache.popitem(last=False)
+        return True
+
+    def issue_token(self, account_no):
+        """Return a session token for ``account_no``, valid for SESSION_TTL seconds."""
+        payload = f"{account_no}|{int(time.time()) + SESSION_TTL}"
+        return payload + '|' + hmac.new(self._secret, payload.encode('utf-8'), _sha256).hexdigest()
+
+    def verify_token(self, token, account_no):
+        # O(1) check of an issue_token() result; no PIN or KDF involved
+        if not token:
+            return False
+        payload, _, sig = token.rpartition('|')
+        acct, _, exp = payload.partition('|')
+        expected = hmac.new(self._secret, payload.encode('utf-8'), _sha256).hexdigest()
+        return (hmac.compare_digest(sig, expected) and acct == account_no
+                and exp.isdigit() and int(exp) > time.time())
 
-    def deposit(self, account_no, amount, note=None):
-        if amount <= 0:
-            raise ValueError('Deposit amount must be positive')
-        cur = self.conn.cursor()
-        cur.execute('UPDATE accounts SET balance = balance + ? WHERE account_no=?', (amount, account_no))
-        now = datetime.datetime.utcnow()
-        cur.execute('INSERT INTO transactions(account_no,type,amount,timestamp,note) VALUES (?,?,?,?,?)',
-                    (account_no, 'deposit', amount, now, note))
-        self.conn.commit()
+    def deposit(self, account_no, amount, note=None, cur=None):
+        self._write_postings([self._stage_posting('deposit', account_no, amount, note, {})], cur)
 
-    def withdraw(self, account_no, amount, note=None):
-        if amount <= 0:
-            raise ValueError('Withdraw amount must be positive')
-        acc = self.get_account(account_no)
-        if not acc:
-            raise ValueError('Account not found')
-        if acc['balance'] < amount:
-            raise ValueError('Insufficient funds')
-        cur = self.conn.cursor()
-        cur.execute('UPDATE accounts SET balance = balance - ? WHERE account_no=?', (amount, account_no))
-        now = datetime.datetime.utcnow()
-        cur.execute('INSERT INTO transactions(account_no,type,amount,timestamp,note) VALUES (?,?,?,?,?)',
-                    (account_no, 'withdraw', amount, now, note))
-        self.conn.commit()
+    def withdraw(self, account_no, amount, note=None, cur=None):
+        self._write_postings([self._stage_posting('withdraw', account_no, amount, note, {})], cur)
 
-    def transfer(self, from_acc, to_acc, amount, note=None):
+    def transfer(self, from_acc, to_acc, amount, note=None, cur=None):
+        amount = to_cents(amount)
         if amount <= 0:
             raise ValueError('Transfer amount must be positive')
         if from_acc == to_acc:
@@ -125,58 +449,101 @@ class DB:
             raise ValueError('Source or destination account not found')
         if fa['balance'] < amount:
             raise ValueError('Insufficient funds')
-        cur = self.conn.cursor()
         now = datetime.datetime.utcnow()
-        cur.execute('UPDATE accounts SET balance = balance - ? WHERE account_no=?', (amount, from_acc))
-        cur.execute('UPDATE accounts SET balance = balance + ? WHERE account_no=?', (amount, to_acc))
-        cur.execute('INSERT INTO transactions(account_no,type,amount,counterparty,timestamp,note) VALUES (?,?,?,?,?,?)',
-                    (from_acc, 'transfer_out', amount, to_acc, now, note))
-        cur.execute('INSERT INTO transactions(account_no,type,amount,counterparty,timestamp,note) VALUES (?,?,?,?,?,?)',
-                    (to_acc, 'transfer_in', amount, from_acc, now, note))
-        self.conn.commit()
+        with self._write_txn(cur) as cur:
+            cur.execute(self._SQL_TRANSFER_UPDATE, (from_acc, amount, amount, from_acc, to_acc))
+            cur.executemany(self._SQL_TX_INSERT,
+                            [(from_acc, 'transfer_out', amount, to_acc, now, note),
+                             (to_acc, 'transfer_in', amount, from_acc, now, note)])
+        self._cache_adjust(from_acc, -amount)
+        self._cache_adjust(to_acc, amount)
 
     def get_transactions(self, account_no, limit=500):
-        cur = self.conn.cursor()
-        cur.execute('SELECT * FROM transactions WHERE account_no=? ORDER BY timestamp DESC LIMIT ?', (account_no, limit))
-        return cur.fetchall()
+        self._cur.execute(self._SQL_GET_TRANSACTIONS, (account_no, limit))
+        return self._cur.fetchall()
+
+    def get_transaction(self, tx_id):
+        self._row_cur.execute(self._SQL_GET_TRANSACTION, (tx_id,))
+        return self._row_cur.fetchone()
 
     def export_transactions_csv(self, account_no, filepath):
-        rows = self.get_transactions(account_no, limit=1000000)
-        with open(filepath, 'w', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow(['id','account_no','type','amount','counterparty','timestamp','note'])
-            for r in rows:
-                writer.writerow([r['id'], r['account_no'], r['type'], r['amount'], r['counterparty'], r['timestamp'], r['note']])
+        # Uses its own connection so it can run off the Tk thread; under WAL the
+        # read transaction sees one snapshot without blocking writers. An
+        # in-memory database can't be reopened, so that case reads through the
+        # shared connection and must run on the DB worker (see submit).
+        own = self.path != ':memory:'
+        conn = sqlite3.connect(self.path) if own else self.conn
+        try:
+            cur = conn.cursor()
+            if own:
+                cur.execute('BEGIN')
+            cur.execute("SELECT id,account_no,type,printf('%d.%02d', amount/100, amount%100),counterparty,timestamp,note "
+                        'FROM transactions WHERE account_no=? ORDER BY timestamp DESC', (account_no,))
+            with open(filepath, 'w', newline='', buffering=CSV_WRITE_BUFFER) as f:
+                writer = csv.writer(f)
+                writer.writerow(['id','account_no','type','amount','counterparty','timestamp','note'])
+                writer.writerows(cur)
+        finally:
+            if own:
+                conn.close()
 
     def export_transaction_pdf(self, tx_row, filepath):
-        if not REPORTLAB_AVAILABLE:
+        self.export_transactions_pdf([tx_row], filepath)
+
+    def export_transactions_pdf(self, tx_rows, filepath):
+        # One receipt per page, rendered in memory and moved into place in one step
+        rl = load_reportlab()
+        if not rl:
             raise RuntimeError('reportlab not installed')
-        c = pdfcanvas.Canvas(filepath, pagesize=letter)
-        w, h = letter
-        y = h - 72
-        c.setFont('Helvetica-Bold', 14)
-        c.drawString(72, y, 'Transaction Receipt')
-        y -= 28
-        c.setFont('Helvetica', 11)
-        for k in ['id','account_no','type','amount','counterparty','timestamp','note']:
-            v = tx_row[k]
-            c.drawString(72, y, f"{k}: {v}")
-            y -= 18
-        c.showPage()
+        letter, pdfcanvas = rl
+        buf = io.BytesIO()
+        c = pdfcanvas.Canvas(buf, pagesize=letter)
+        h = letter[1]
+        for tx_row in tx_rows:
+            c.setFont('Helvetica-Bold', 14)
+            c.drawString(72, h - 72, 'Transaction Receipt')
+            text = c.beginText(72, h - 100)
+            text.setFont('Helvetica', 11, leading=18)
+            for k in ['id','account_no','type','amount','counterparty','timestamp','note']:
+                v = fmt_money(tx_row[k]) if k == 'amount' else tx_row[k]
+                text.textLine(f"{k}: {v}")
+            c.drawText(text)
+            c.showPage()
         c.save()
+        tmp = filepath + '.tmp'
+        try:
+            with open(tmp, 'wb') as f:
+                f.write(buf.getvalue())
+            os.replace(tmp, filepath)
+        except Exception:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
 
     def _generate_account_no(self):
-        # 10-digit unique-ish account number
-        while True:
-            acct = ''.join(random.choices(string.digits, k=10))
-            if not self.get_account(acct):
-                return acct
+        # 10-digit unique-ish account number; uniqueness is enforced on insert
+        return ''.join(random.choices(string.digits, k=10))
 
-    def _hash_pin(self, pin):
-        # Simple SHA-256 for demo only. Use bcrypt/argon2 in production.
+    def _pin_bytes(self, pin):
         if isinstance(pin, str):
             pin = pin.encode('utf-8')
-        return hashlib.sha256(pin).hexdigest()
+        return pin
+
+    def _hash_pin(self, pin):
+        # Argon2id when argon2-cffi is installed; SHA-256 is a demo-only fallback.
+        if self._ph:
+            return self._ph.hash(self._pin_bytes(pin))
+        return _sha256(self._pin_bytes(pin)).hexdigest()
+
+    def _verify_pin(self, pin_hash, pin):
+        if pin_hash.startswith('$argon2'):
+            if not self._ph:
+                raise RuntimeError('argon2-cffi not installed')
+            try:
+                return self._ph.verify(pin_hash, self._pin_bytes(pin))
+            except (VerifyMismatchError, InvalidHashError):
+                return False
+        return hmac.compare_digest(pin_hash, _sha256(self._pin_bytes(pin)).hexdigest())
 
 # ------------------------- GUI -------------------------
 
@@ -186,9 +553,24 @@ class BankingApp(tk.Tk):
         self.title('Banking Management System')
         self.geometry('900x600')
         self.db = DB()
+        self.protocol('WM_DELETE_WINDOW', self.on_close)
         self.current_account = None
+        self.session_token = None
+        self._hist_iter = iter(())
+        self._hist_job = None
+        self._account_rows = []
+        self._accounts_key = None
+        self._pending = []
+        self._poll_job = None
+        self._login_tokens = LOGIN_BURST
+        self._login_stamp = time.monotonic()
         self._build_ui()
 
+    def on_close(self):
+        # Let queued DB work (e.g. a pending deposit batch) commit before exiting
+        self.db.close()
+        self.destroy()
+
     def _build_ui(self):
         # Left pane: actions
         left = ttk.Frame(self)
@@ -199,7 +581,7 @@ class BankingApp(tk.Tk):
         search_entry = ttk.Entry(left, textvariable=self.search_var)
         search_entry.pack(fill='x')
         ttk.Button(left, text='Search', command=self.refresh_account_list).pack(fill='x', pady=4)
-        ttk.Button(left, text='Refresh', command=self.refresh_account_list).pack(fill='x', pady=2)
+        ttk.Button(left, text='Refresh', command=lambda: self.refresh_account_list(force=True)).pack(fill='x', pady=2)
         ttk.Button(left, text='Quick Create', command=self.quick_create).pack(fill='x', pady=6)
         ttk.Button(left, text='Create Account', command=self.create_account_dialog).pack(fill='x', pady=2)
         ttk.Button(left, text='Delete Account', command=self.delete_selected_account).pack(fill='x', pady=2)
@@ -251,13 +633,57 @@ class BankingApp(tk.Tk):
         self.refresh_account_list()
 
     # ---------------- UI actions ----------------
-    def refresh_account_list(self):
+    def refresh_account_list(self, force=False):
         search = self.search_var.get().strip()
-        rows = self.db.list_accounts(search=search if search else None)
-        self.accounts_listbox.delete(0, 'end')
-        for r in rows:
-            display = f"{r['account_no']} — {r['name']} (Bal: {r['balance']:.2f})"
-            self.accounts_listbox.insert('end', display)
+        # Nothing to do if the search and the data are unchanged since last time
+        key = (search, self.db.version)
+        if key == self._accounts_key and not force:
+            return
+        rows = self.db.call(self.db.list_accounts, search=search if search else None)
+        new = [f"{r[0]} — {r[1]} (Bal: {fmt_money(r[2])})" for r in rows]
+        old = self._account_rows
+        # Only touch the listbox between the unchanged head and tail
+        lo = 0
+        while lo < len(old) and lo < len(new) and old[lo] == new[lo]:
+            lo += 1
+        hi_old, hi_new = len(old), len(new)
+        while hi_old > lo and hi_new > lo and old[hi_old-1] == new[hi_new-1]:
+            hi_old -= 1
+            hi_new -= 1
+        if hi_old > lo:
+            self.accounts_listbox.delete(lo, hi_old-1)
+        if hi_new > lo:
+            self.accounts_listbox.insert(lo, *new[lo:hi_new])
+        self._account_rows = new
+        self._accounts_key = key
+
+    def _watch(self, fut, on_done, on_error=None):
+        """Call ``on_done(result)`` on the Tk thread once ``fut`` finishes.
+
+        Errors are shown in a message box, then passed to ``on_error`` if given.
+        """
+        self._pending.append((fut, on_done, on_error))
+        if self._poll_job is None:
+            self._poll_job = self.after(POLL_MS, self._poll_futures)
+
+    def _poll_futures(self):
+        self._poll_job = None
+        # Split in one pass: a future finishing between two done() checks
+        # would otherwise land in neither list
+        done, pending = [], []
+        for p in self._pending:
+            (done if p[0].done() else pending).append(p)
+        self._pending = pending
+        for fut, on_done, on_error in done:
+            err = fut.exception()
+            if err is not None:
+                messagebox.showerror('Error', str(err))
+                if on_error:
+                    on_error(err)
+            else:
+                on_done(fut.result())
+        if self._pending and self._poll_job is None:
+            self._poll_job = self.after(POLL_MS, self._poll_futures)
 
     def on_account_select(self, event=None):
         sel = self.accounts_listbox.curselection()
@@ -268,12 +694,12 @@ class BankingApp(tk.Tk):
         self.show_account(acct_no)
 
     def show_account(self, account_no):
-        acc = self.db.get_account(account_no)
+        acc = self.db.call(self.db.get_account, account_no)
         if not acc:
             messagebox.showerror('Error','Account not found')
             return
         self.header_label.config(text=f"{acc['account_no']} — {acc['name']}")
-        self.balance_var.set(f"Balance: {acc['balance']:.2f}")
+        self.balance_var.set(f"Balance: {fmt_money(acc['balance'])}")
         self.current_account = acc['account_no']
         self.view_history()
 
@@ -285,9 +711,10 @@ class BankingApp(tk.Tk):
     def quick_create(self):
         name = 'QuickUser_' + ''.join(random.choices(string.ascii_letters, k=5))
         pin = ''.join(random.choices(string.digits, k=4))
-        acct = self.db.create_account(name, pin, initial_deposit=0.0)
-        messagebox.showinfo('Quick Create', f'Created account {acct}\nPIN: {pin} (store it!)')
-        self.refresh_account_list()
+        def done(acct):
+            messagebox.showinfo('Quick Create', f'Created account {acct}\nPIN: {pin} (store it!)')
+            self.refresh_account_list()
+        self._watch(self.db.submit(self.db.create_account, name, pin, initial_deposit=0.0), done)
 
     def delete_selected_account(self):
         sel = self.accounts_listbox.curselection()
@@ -297,14 +724,15 @@ class BankingApp(tk.Tk):
         text = self.accounts_listbox.get(sel[0])
         acct_no = text.split(' ')[0]
         if messagebox.askyesno('Confirm','Delete account %s and all its transactions?'%acct_no):
-            self.db.delete_account(acct_no)
-            self.refresh_account_list()
-            if self.current_account == acct_no:
-                self.current_account = None
-                self.header_label.config(text='No account selected')
-                self.balance_var.set('')
-                for i in self.tree.get_children():
-                    self.tree.delete(i)
+            def done(_):
+                self.refresh_account_list()
+                if self.current_account == acct_no:
+                    self.current_account = None
+                    self.session_token = None
+                    self.header_label.config(text='No account selected')
+                    self.balance_var.set('')
+                    self._clear_history()
+            self._watch(self.db.submit(self.db.delete_account, acct_no), done)
 
     def login(self):
         acct = self.login_acc_var.get().strip()
@@ -312,48 +740,86 @@ class BankingApp(tk.Tk):
         if not acct or not pin:
             messagebox.showwarning('Login','Enter account and PIN')
             return
-        if self.db.authenticate(acct, pin):
-            messagebox.showinfo('Login','Login successful')
-            self.show_account(acct)
-        else:
-            messagebox.showerror('Login','Invalid account or PIN')
+        if not self._take_login_token():
+            messagebox.showwarning('Login','Too many login attempts, try again shortly')
+            return
+        def done(ok):
+            if ok:
+                self.session_token = self.db.issue_token(acct)
+                messagebox.showinfo('Login','Login successful')
+                self.show_account(acct)
+            else:
+                messagebox.showerror('Login','Invalid account or PIN')
+        self._watch(self.db.submit(self.db.authenticate, acct, pin), done)
+
+    def _take_login_token(self):
+        # Token bucket: LOGIN_BURST attempts, refilled one per LOGIN_REFILL seconds
+        now = time.monotonic()
+        self._login_tokens = min(LOGIN_BURST, self._login_tokens + (now - self._login_stamp) / LOGIN_REFILL)
+        self._login_stamp = now
+        if self._login_tokens < 1:
+            return False
+        self._login_tokens -= 1
+        return True
+
+    def _with_session(self, then):
+        """Run ``then()`` once the current account has a valid session, asking for the PIN if needed."""
+        from tkinter import simpledialog
+        acct = self.current_account
+        if self.db.verify_token(self.session_token, acct):
+            then()
+            return
+        pin = simpledialog.askstring('PIN', f'PIN for account {acct}', show='*')
+        if not pin:
+            return
+        if not self._take_login_token():
+            messagebox.showwarning('Login','Too many login attempts, try again shortly')
+            return
+        def done(ok):
+            if ok:
+                self.session_token = self.db.issue_token(acct)
+                then()
+            else:
+                messagebox.showerror('Login','Invalid PIN')
+        self._watch(self.db.submit(self.db.authenticate, acct, pin.strip()), done)
 
     def logout(self):
         self.current_account = None
+        self.session_token = None
         self.header_label.config(text='No account selected')
         self.balance_var.set('')
-        for i in self.tree.get_children():
-            self.tree.delete(i)
+        self._clear_history()
 
     def deposit_dialog(self):
+        from tkinter import simpledialog
         if not self.current_account:
             messagebox.showwarning('Deposit','Select or login to an account')
             return
         amt = simpledialog.askfloat('Deposit','Amount to deposit', minvalue=0.01)
         if amt is None:
             return
-        try:
-            self.db.deposit(self.current_account, float(amt))
+        acct = self.current_account
+        def done(_):
             messagebox.showinfo('Deposit','Deposit successful')
-            self.show_account(self.current_account)
-        except Exception as e:
-            messagebox.showerror('Error', str(e))
+            self.show_account(acct)
+        self._watch(self.db.submit_posting('deposit', acct, float(amt)), done)
 
     def withdraw_dialog(self):
+        from tkinter import simpledialog
         if not self.current_account:
             messagebox.showwarning('Withdraw','Select or login to an account')
             return
         amt = simpledialog.askfloat('Withdraw','Amount to withdraw', minvalue=0.01)
         if amt is None:
             return
-        try:
-            self.db.withdraw(self.current_account, float(amt))
+        acct = self.current_account
+        def done(_):
             messagebox.showinfo('Withdraw','Withdraw successful')
-            self.show_account(self.current_account)
-        except Exception as e:
-            messagebox.showerror('Error', str(e))
+            self.show_account(acct)
+        self._with_session(lambda: self._watch(self.db.submit_posting('withdraw', acct, float(amt)), done))
 
     def transfer_dialog(self):
+        from tkinter import simpledialog
         if not self.current_account:
             messagebox.showwarning('Transfer','Select or login to an account')
             return
@@ -363,35 +829,49 @@ class BankingApp(tk.Tk):
         amt = simpledialog.askfloat('Transfer','Amount to transfer', minvalue=0.01)
         if amt is None:
             return
-        try:
-            self.db.transfer(self.current_account, to_acc.strip(), float(amt))
+        acct = self.current_account
+        def done(_):
             messagebox.showinfo('Transfer','Transfer successful')
-            self.show_account(self.current_account)
-        except Exception as e:
-            messagebox.showerror('Error', str(e))
+            self.show_account(acct)
+        self._with_session(lambda: self._watch(self.db.submit(self.db.transfer, acct, to_acc.strip(), float(amt)), done))
 
     def view_history(self):
         if not self.current_account:
             return
-        for i in self.tree.get_children():
-            self.tree.delete(i)
-        rows = self.db.get_transactions(self.current_account, limit=1000)
-        for r in rows:
-            self.tree.insert('', 'end', values=(r['id'], r['type'], f"{r['amount']:.2f}", r['counterparty'] or '', str(r['timestamp']), r['note'] or ''))
+        self._clear_history()
+        self._hist_iter = iter(self.db.call(self.db.get_transactions, self.current_account, limit=1000))
+        self._pump_history()
+
+    def _pump_history(self):
+        # Insert one chunk, then yield to the mainloop so the first rows paint
+        # immediately and the UI stays responsive for long histories.
+        self._hist_job = None
+        n = 0
+        for r in itertools.islice(self._hist_iter, HISTORY_CHUNK):
+            self.tree.insert('', 'end', values=(r[0], r[1], fmt_money(r[2]), r[3] or '', str(r[4]), r[5] or ''))
+            n += 1
+        if n == HISTORY_CHUNK:
+            self._hist_job = self.after(1, self._pump_history)
+
+    def _clear_history(self):
+        if self._hist_job is not None:
+            self.after_cancel(self._hist_job)
+            self._hist_job = None
+        self._hist_iter = iter(())
+        self.tree.delete(*self.tree.get_children())
 
     def on_tx_double(self, event):
+        from tkinter import filedialog
         sel = self.tree.selection()
         if not sel:
             return
         item = self.tree.item(sel[0])
         tx_id = item['values'][0]
-        cur = self.db.conn.cursor()
-        cur.execute('SELECT * FROM transactions WHERE id=?', (tx_id,))
-        row = cur.fetchone()
+        row = self.db.call(self.db.get_transaction, tx_id)
         if not row:
             return
         # Offer export PDF for this transaction
-        if REPORTLAB_AVAILABLE:
+        if load_reportlab():
             if messagebox.askyesno('Export PDF','Export this transaction as PDF?'):
                 path = filedialog.asksaveasfilename(defaultextension='.pdf', filetypes=[('PDF','*.pdf')])
                 if path:
@@ -401,9 +881,10 @@ class BankingApp(tk.Tk):
                     except Exception as e:
                         messagebox.showerror('Error', str(e))
         else:
-            messagebox.showinfo('Transaction', f"ID: {row['id']}\nType: {row['type']}\nAmount: {row['amount']}")
+            messagebox.showinfo('Transaction', f"ID: {row['id']}\nType: {row['type']}\nAmount: {fmt_money(row['amount'])}")
 
     def export_csv_selected(self):
+        from tkinter import filedialog
         sel = self.accounts_listbox.curselection()
         if not sel:
             messagebox.showwarning('Export','Select an account to export')
@@ -413,16 +894,21 @@ class BankingApp(tk.Tk):
         path = filedialog.asksaveasfilename(defaultextension='.csv', filetypes=[('CSV','*.csv')])
         if not path:
             return
-        try:
-            self.db.export_transactions_csv(acct_no, path)
-            messagebox.showinfo('Export','CSV exported')
-        except Exception as e:
-            messagebox.showerror('Error', str(e))
+        # Runs on its own thread and connection so long exports don't hold up the DB worker
+        fut = Future()
+        def work():
+            try:
+                fut.set_result(self.db.export_transactions_csv(acct_no, path))
+            except Exception as e:
+                fut.set_exception(e)
+        threading.Thread(target=work, daemon=True).start()
+        self._watch(fut, lambda _: messagebox.showinfo('Export','CSV exported'))
 
 # ----------------- Dialogs -----------------
 class CreateAccountDialog(tk.Toplevel):
     def __init__(self, parent, db:DB):
         super().__init__(parent)
+        self.parent = parent
         self.db = db
         self.title('Create Account')
         self.geometry('320x220')
@@ -439,7 +925,8 @@ class CreateAccountDialog(tk.Toplevel):
         self.init_var = tk.DoubleVar(value=0.0)
         ttk.Entry(self, textvariable=self.init_var).pack(fill='x', padx=12)
 
-        ttk.Button(self, text='Create', command=self.create).pack(pady=12)
+        self.create_button = ttk.Button(self, text='Create', command=self.create)
+        self.create_button.pack(pady=12)
 
     def create(self):
         name = self.name_var.get().strip()
@@ -451,9 +938,18 @@ class CreateAccountDialog(tk.Toplevel):
         if not pin.isdigit() or not (4 <= len(pin) <= 8):
             messagebox.showwarning('PIN','PIN must be 4-8 digits')
             return
-        acct = self.db.create_account(name, pin, initial_deposit=float(init))
-        messagebox.showinfo('Created', f'Account {acct} created. PIN: {pin} (store it)')
-        self.destroy()
+        # Hashing the PIN is slow with Argon2, so create on the DB worker and
+        # keep the button disabled until it finishes
+        self.create_button.state(['disabled'])
+        def done(acct):
+            messagebox.showinfo('Created', f'Account {acct} created. PIN: {pin} (store it)')
+            self.destroy()
+        self.parent._watch(self.db.submit(self.db.create_account, name, pin, initial_deposit=float(init)), done,
+                           on_error=self._create_failed)
+
+    def _create_failed(self, err):
+        if self.winfo_exists():
+            self.create_button.state(['!disabled'])
 
 # ----------------- Main -----------------
 